@@ -0,0 +1,103 @@
+# benchmarks/bench_sesiones.py
+"""
+Benchmark de memoria por sesión inactiva: representación anterior vs. compacta
+
+Ejecutar con: python benchmarks/bench_sesiones.py [--sesiones 10000 100000] [--turnos 10]
+"""
+
+import argparse
+import gc
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import google.generativeai as genai
+
+from main import GEMINI_TOOLS, MODEL_NAME
+from prompts import SYSTEM_PROMPT
+from sesiones import Sesion, ROL_USUARIO, ROL_ASISTENTE
+
+MENSAJE_USUARIO = "Hola, quería saber en qué estado está mi pedido ORD-002 y si llega esta semana"
+MENSAJE_ASISTENTE = (
+    "¡Hola! Tu pedido ORD-002 (Zapatillas Deportivas talle 40) está En camino y "
+    "llegará mañana antes de las 18hs a Calle Falsa 456, Rosario. ¿Puedo ayudarte en algo más? 😊"
+)
+
+
+def sesion_anterior(turnos: int):
+    """Sesión como se guardaba antes: ChatSession propio + historial paralelo en dicts"""
+    model = genai.GenerativeModel(
+        model_name=MODEL_NAME,
+        tools=GEMINI_TOOLS,
+        system_instruction=SYSTEM_PROMPT
+    )
+    chat = model.start_chat(enable_automatic_function_calling=False)
+    history = []
+    for i in range(turnos):
+        user = i % 2 == 0
+        texto = f"{MENSAJE_USUARIO if user else MENSAJE_ASISTENTE} ({i})"
+        chat.history.append(genai.protos.Content(role="user" if user else "model", parts=[genai.protos.Part(text=texto)]))
+        history.append({"role": "user" if user else "assistant", "content": texto})
+    return {"chat": chat, "history": history, "session_name": "Consulta de pedido"}
+
+
+def sesion_compacta(turnos: int):
+    """Sesión con la representación de sesiones.py"""
+    sesion = Sesion("Consulta de pedido")
+    for i in range(turnos):
+        user = i % 2 == 0
+        texto = f"{MENSAJE_USUARIO if user else MENSAJE_ASISTENTE} ({i})"
+        sesion.agregar_turno(ROL_USUARIO if user else ROL_ASISTENTE, texto)
+    return sesion
+
+
+def _rss_kb() -> int:
+    """Memoria residente actual del proceso en KB (Linux)"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def medir(representacion: str, cantidad: int, turnos: int):
+    """Crea `cantidad` sesiones e imprime los bytes por sesión (corre en un subproceso)"""
+    fabrica = sesion_anterior if representacion == "anterior" else sesion_compacta
+    gc.collect()
+    inicio_kb = _rss_kb()
+    conversaciones = {f"sesion-{i}": fabrica(turnos) for i in range(cantidad)}
+    gc.collect()
+    print((_rss_kb() - inicio_kb) * 1024 / len(conversaciones))
+
+
+def medir_en_subproceso(representacion: str, cantidad: int, turnos: int) -> float:
+    """Mide cada representación en un proceso limpio para no mezclar memoria"""
+    salida = subprocess.run(
+        [sys.executable, "-W", "ignore", __file__, "--medir", representacion,
+         "--sesiones", str(cantidad), "--turnos", str(turnos)],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, "LOG_LEVEL": "ERROR"}
+    )
+    return float(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--turnos", type=int, default=10)
+    parser.add_argument("--medir", choices=["anterior", "compacta"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.medir, args.sesiones[0], args.turnos)
+        return
+
+    print(f"Turnos por sesión: {args.turnos}")
+    print(f"{'sesiones':>10} {'anterior (B/ses)':>18} {'compacta (B/ses)':>18} {'reducción':>10}")
+    for cantidad in args.sesiones:
+        anterior = medir_en_subproceso("anterior", cantidad, args.turnos)
+        compacta = medir_en_subproceso("compacta", cantidad, args.turnos)
+        print(f"{cantidad:>10} {anterior:>18,.0f} {compacta:>18,.0f} {anterior / compacta:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
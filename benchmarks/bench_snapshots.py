@@ -0,0 +1,62 @@
+# benchmarks/bench_snapshots.py
+"""
+Benchmark de restauración de sesiones desde el archivo de snapshots
+
+Ejecutar con: python benchmarks/bench_snapshots.py [--sesiones 100000] [--turnos 10]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import snapshots
+from bench_sesiones import sesion_compacta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sesiones", type=int, default=100_000)
+    parser.add_argument("--turnos", type=int, default=10)
+    parser.add_argument("--incrementales", type=int, default=2,
+                        help="Turnos agregados por sesión en registros incrementales después del snapshot completo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        snapshots._config["archivo"] = os.path.join(directorio, "sessions.jsonl")
+
+        conversaciones = {f"sesion-{i}": sesion_compacta(args.turnos) for i in range(args.sesiones)}
+
+        inicio = time.perf_counter()
+        snapshots.compactar_archivo(snapshots.snapshot_completo(conversaciones))
+        escritura_completa = time.perf_counter() - inicio
+
+        # Registros incrementales: turnos nuevos en todas las sesiones
+        for session_id, sesion in conversaciones.items():
+            for i in range(args.incrementales):
+                sesion.agregar_turno("user" if i % 2 == 0 else "assistant", f"Mensaje incremental {i}")
+            snapshots.marcar_modificada(session_id)
+
+        inicio = time.perf_counter()
+        snapshots.escribir_lineas(snapshots.tomar_cambios(conversaciones))
+        escritura_incremental = time.perf_counter() - inicio
+
+        tamano_mb = os.path.getsize(snapshots._config["archivo"]) / 1024 / 1024
+        del conversaciones
+
+        inicio = time.perf_counter()
+        restauradas = snapshots.restaurar()
+        restauracion = time.perf_counter() - inicio
+
+    print(f"Sesiones: {len(restauradas):,} ({args.turnos} turnos + {args.incrementales} incrementales)")
+    print(f"Archivo: {tamano_mb:.1f} MB")
+    print(f"Snapshot completo:    {escritura_completa * 1000:>8.0f} ms")
+    print(f"Snapshot incremental: {escritura_incremental * 1000:>8.0f} ms")
+    print(f"Restauración:         {restauracion * 1000:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
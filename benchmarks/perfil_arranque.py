@@ -0,0 +1,56 @@
+# benchmarks/perfil_arranque.py
+"""
+Perfil de arranque: tiempo de import de main.py (python -X importtime) y del warm-up
+
+Ejecutar con: python benchmarks/perfil_arranque.py [--top 15]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+
+
+def perfil_imports(top: int):
+    """Muestra los módulos con mayor tiempo de import acumulado al importar main"""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", "import main"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+        env={**os.environ, "LOG_LEVEL": "ERROR"}
+    )
+
+    filas = []
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        propio, acumulado, modulo = [parte.strip() for parte in linea.split(":", 1)[1].split("|")]
+        filas.append((int(acumulado), int(propio), modulo))
+
+    total = next((acumulado for acumulado, _, modulo in filas if modulo == "main"), 0)
+    print(f"Import de main: {total / 1000:.1f} ms")
+    print(f"{'acumulado (ms)':>15} {'propio (ms)':>12}  módulo")
+    for acumulado, propio, modulo in sorted(filas, reverse=True)[:top]:
+        print(f"{acumulado / 1000:>15.1f} {propio / 1000:>12.1f}  {modulo}")
+
+
+def perfil_warmup():
+    """Mide la duración del warm-up del lifespan (sin abrir la conexión)"""
+    sys.path.insert(0, RAIZ)
+    import main
+
+    inicio = time.perf_counter()
+    asyncio.run(main.calentar())
+    print(f"Warm-up: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    perfil_imports(args.top)
+    perfil_warmup()
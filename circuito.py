@@ -0,0 +1,109 @@
+# circuito.py
+"""
+Circuit breaker para las llamadas a Gemini
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Tuple
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# Estados del circuito (el valor numérico es el que se exporta como métrica)
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+VALOR_ESTADO = {CERRADO: 0, ABIERTO: 1, SEMIABIERTO: 2}
+
+
+class CircuitoAbierto(Exception):
+    """La llamada se rechazó porque el circuito está abierto"""
+
+
+class CircuitBreaker:
+    """
+    Abre el circuito tras `umbral_fallos` llamadas fallidas o lentas consecutivas.
+    Mientras está abierto rechaza las llamadas; pasados `segundos_abierto`
+    deja pasar una llamada de prueba (semiabierto) y se cierra si sale bien.
+    """
+
+    def __init__(self, nombre: str, umbral_fallos: int, umbral_latencia: float, segundos_abierto: float):
+        self.nombre = nombre
+        self.umbral_fallos = umbral_fallos
+        self.umbral_latencia = umbral_latencia
+        self.segundos_abierto = segundos_abierto
+
+        self.estado = CERRADO
+        self.fallos_consecutivos = 0
+        self.abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def _cambiar_estado(self, estado: str):
+        if estado != self.estado:
+            logger.warning("Circuito '%s': %s -> %s", self.nombre, self.estado, estado)
+            metricas.incrementar("circuit_breaker_transitions_total", circuito=self.nombre, estado=estado)
+            self.estado = estado
+            # Una prueba pendiente no debe bloquear el próximo período semiabierto
+            if estado != SEMIABIERTO:
+                self._prueba_en_curso = False
+
+    def permitir(self) -> Tuple[bool, bool]:
+        """
+        Indica si se puede hacer una llamada ahora y si esa llamada es la prueba
+        del estado semiabierto: (permitida, es_prueba)
+        """
+        with self._lock:
+            if self.estado == CERRADO:
+                return True, False
+
+            if self.estado == ABIERTO and time.monotonic() - self.abierto_desde >= self.segundos_abierto:
+                self._cambiar_estado(SEMIABIERTO)
+
+            if self.estado == SEMIABIERTO and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True, True
+
+            return False, False
+
+    def liberar(self):
+        """Libera la llamada de prueba si se canceló antes de terminar (solo debe llamarla la prueba)"""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def registrar(self, exito: bool, latencia: float, es_prueba: bool = False):
+        """Registra el resultado de una llamada; una llamada lenta cuenta como fallo"""
+        fallo = not exito or latencia > self.umbral_latencia
+
+        with self._lock:
+            if es_prueba:
+                self._prueba_en_curso = False
+
+            if not fallo:
+                self.fallos_consecutivos = 0
+                self._cambiar_estado(CERRADO)
+                return
+
+            self.fallos_consecutivos += 1
+            if self.estado == SEMIABIERTO or self.fallos_consecutivos >= self.umbral_fallos:
+                self.abierto_desde = time.monotonic()
+                self._cambiar_estado(ABIERTO)
+
+
+def crear_circuito_gemini() -> CircuitBreaker:
+    """Crea el circuit breaker de Gemini con la configuración de las variables de entorno"""
+    circuito = CircuitBreaker(
+        nombre="gemini",
+        umbral_fallos=int(os.getenv("CB_FAILURE_THRESHOLD", "5")),
+        umbral_latencia=float(os.getenv("CB_LATENCY_THRESHOLD", "10")),
+        segundos_abierto=float(os.getenv("CB_OPEN_SECONDS", "30"))
+    )
+
+    metricas.describir("circuit_breaker_state", "Estado del circuito de Gemini (0=cerrado, 1=abierto, 2=semiabierto)")
+    metricas.describir("circuit_breaker_transitions_total", "Cambios de estado del circuito")
+    metricas.registrar_gauge("circuit_breaker_state", lambda: VALOR_ESTADO[circuito.estado])
+    return circuito
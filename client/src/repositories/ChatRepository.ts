@@ -17,6 +17,7 @@ export interface ChatResponse {
   session_id: string;
   response: string;
   tool_calls?: ToolCall[];
+  degraded?: boolean;
 }
 
 export interface Session {
@@ -0,0 +1,125 @@
+# compactar.py
+"""
+Compactación de resultados de herramientas antes de enviarlos a Gemini
+"""
+
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Configuración por defecto: se aplica a todas las herramientas
+CONFIG_DEFECTO: Dict[str, Any] = {
+    "omitir": [],            # Campos redundantes a eliminar
+    "max_items": 20,         # Máximo de elementos por lista
+    "colapsar_espacios": True
+}
+
+# Configuración específica por herramienta (se combina con CONFIG_DEFECTO)
+CONFIG_COMPACTACION: Dict[str, Dict[str, Any]] = {
+    "listar_productos": {
+        "omitir": ["total"]
+    },
+    "consultar_categorias": {
+        "omitir": ["descripcion"]
+    },
+    "rastrear_pedido": {
+        "omitir": ["email"]
+    },
+    "rastrear_pedidos": {
+        "omitir": ["email"]
+    },
+    "consultar_info_plataforma": {
+        "omitir": ["tipo"]
+    },
+    "obtener_historial_compras": {
+        "omitir": ["email", "total_productos"],
+        "max_items": 10
+    }
+}
+
+# Estimación aproximada de tokens: ~4 caracteres por token
+CARACTERES_POR_TOKEN = 4
+
+_ESPACIOS = re.compile(r"[ \t]+")
+
+
+def obtener_config(nombre: str) -> Dict[str, Any]:
+    """Retorna la configuración efectiva de compactación para una herramienta"""
+    return {**CONFIG_DEFECTO, **CONFIG_COMPACTACION.get(nombre, {})}
+
+
+def estimar_tokens(valor: Any) -> int:
+    """Estima la cantidad de tokens que ocupa un valor serializado a JSON"""
+    texto = json.dumps(valor, ensure_ascii=False, separators=(",", ":"))
+    return max(1, len(texto) // CARACTERES_POR_TOKEN)
+
+
+@lru_cache(maxsize=256)
+def colapsar_espacios(texto: str) -> str:
+    """Elimina indentación y líneas vacías de un texto multilínea (cacheado: las FAQ se repiten)"""
+    lineas = (_ESPACIOS.sub(" ", linea).strip() for linea in texto.splitlines())
+    return "\n".join(linea for linea in lineas if linea)
+
+
+def _es_vacio(valor: Any) -> bool:
+    """Indica si un valor no aporta información al modelo"""
+    return valor is None or valor == "" or valor == [] or valor == {}
+
+
+def _compactar_valor(valor: Any, config: Dict[str, Any]) -> Any:
+    """Compacta recursivamente un valor según la configuración"""
+    if isinstance(valor, dict):
+        return _compactar_dict(valor, config)
+
+    if isinstance(valor, list):
+        return [_compactar_valor(item, config) for item in valor]
+
+    if isinstance(valor, str) and config["colapsar_espacios"]:
+        return colapsar_espacios(valor)
+
+    return valor
+
+
+def _compactar_dict(datos: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """Elimina campos nulos, falsos o redundantes y trunca listas largas"""
+    compacto: Dict[str, Any] = {}
+    omitir = config["omitir"]
+    max_items = config["max_items"]
+
+    for clave, valor in datos.items():
+        if clave in omitir or _es_vacio(valor) or valor is False:
+            continue
+
+        if isinstance(valor, list) and max_items and len(valor) > max_items:
+            compacto[clave] = _compactar_valor(valor[:max_items], config)
+            compacto[f"{clave}_continuacion"] = (
+                f"Mostrando {max_items} de {len(valor)}. "
+                "Pide al cliente un dato más específico para ver el resto."
+            )
+            continue
+
+        compacto[clave] = _compactar_valor(valor, config)
+
+    return compacto
+
+
+def compactar_resultado(nombre: str, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce el tamaño del resultado de una herramienta antes de enviarlo a Gemini.
+    El resultado original no se modifica.
+    """
+    config = obtener_config(nombre)
+    compacto = _compactar_dict(resultado, config)
+
+    tokens_antes = estimar_tokens(resultado)
+    tokens_despues = estimar_tokens(compacto)
+    logger.info(
+        "Resultado de '%s' compactado: %d -> %d tokens (ahorro %d)",
+        nombre, tokens_antes, tokens_despues, tokens_antes - tokens_despues
+    )
+
+    return compacto
@@ -3,6 +3,9 @@
 Base de datos simulada para el e-commerce
 """
 
+import threading
+from typing import Dict, Any, List
+
 # Catálogo de productos
 PRODUCTOS = {
     "remera": {
@@ -160,4 +163,103 @@ INFO_PLATAFORMA = {
     - Teléfono: 0800-555-TIENDA
     - Horario de atención: Lunes a Viernes 9-18hs, Sábados 10-14hs
     """
-}
\ No newline at end of file
+}
+
+
+# ==================== ÍNDICES Y RESÚMENES POR CLIENTE ====================
+# Se mantienen de forma incremental al registrar o actualizar pedidos,
+# para no recorrer todos los pedidos en cada consulta de historial.
+
+# Estados en los que un pedido ya no está "abierto"
+ESTADOS_CERRADOS = {"Entregado", "Cancelado"}
+
+# Protege PEDIDOS y los índices: las herramientas corren en un pool de hilos
+LOCK_PEDIDOS = threading.RLock()
+
+# Campos que alimentan los índices y el resumen; no se cambian con actualizar_estado_pedido
+CAMPOS_INDEXADOS = {"id", "email", "fecha", "estado"}
+
+# email -> IDs de orden del cliente
+PEDIDOS_POR_CLIENTE: Dict[str, List[str]] = {}
+
+# email -> resumen (cantidad de pedidos, último pedido, abiertos por estado)
+RESUMENES_CLIENTES: Dict[str, Dict[str, Any]] = {}
+
+
+def _email_de(pedido: Dict[str, Any]) -> str:
+    """Retorna el email normalizado de un pedido"""
+    return pedido.get("email", "").lower().strip()
+
+
+def _mover_estado(resumen: Dict[str, Any], id_orden: str, estado_anterior: str, estado_nuevo: str):
+    """Actualiza los pedidos abiertos de un resumen cuando cambia un estado"""
+    abiertos = resumen["abiertos_por_estado"]
+
+    if estado_anterior and estado_anterior not in ESTADOS_CERRADOS:
+        ids = abiertos.get(estado_anterior, [])
+        if id_orden in ids:
+            ids.remove(id_orden)
+        if not ids:
+            abiertos.pop(estado_anterior, None)
+
+    if estado_nuevo and estado_nuevo not in ESTADOS_CERRADOS:
+        abiertos.setdefault(estado_nuevo, []).append(id_orden)
+
+
+def _indexar_pedido(pedido: Dict[str, Any]):
+    """Agrega un pedido a los índices y al resumen de su cliente"""
+    email = _email_de(pedido)
+    PEDIDOS_POR_CLIENTE.setdefault(email, []).append(pedido["id"])
+
+    resumen = RESUMENES_CLIENTES.setdefault(email, {
+        "total_pedidos": 0,
+        "ultimo_pedido": None,
+        "abiertos_por_estado": {}
+    })
+    resumen["total_pedidos"] += 1
+
+    ultimo = resumen["ultimo_pedido"]
+    if ultimo is None or pedido["fecha"] >= ultimo["fecha"]:
+        resumen["ultimo_pedido"] = {
+            "id_orden": pedido["id"],
+            "fecha": pedido["fecha"],
+            "estado": pedido["estado"]
+        }
+
+    _mover_estado(resumen, pedido["id"], None, pedido["estado"])
+
+
+def registrar_pedido(pedido: Dict[str, Any]):
+    """Registra un pedido nuevo y actualiza el resumen de su cliente"""
+    with LOCK_PEDIDOS:
+        if pedido["id"] in PEDIDOS:
+            raise ValueError(f"La orden '{pedido['id']}' ya existe")
+
+        PEDIDOS[pedido["id"]] = pedido
+        _indexar_pedido(pedido)
+
+
+def actualizar_estado_pedido(id_orden: str, estado: str, **campos: Any):
+    """
+    Cambia el estado de un pedido (y opcionalmente otros campos, ej: tracking)
+    manteniendo al día el resumen de su cliente.
+    Los campos indexados (id, email, fecha) no se pueden cambiar por esta vía.
+    """
+    indexados = CAMPOS_INDEXADOS & campos.keys()
+    if indexados:
+        raise ValueError(f"No se pueden modificar campos indexados: {', '.join(sorted(indexados))}")
+
+    with LOCK_PEDIDOS:
+        pedido = PEDIDOS[id_orden]
+        resumen = RESUMENES_CLIENTES[_email_de(pedido)]
+
+        _mover_estado(resumen, id_orden, pedido["estado"], estado)
+        pedido["estado"] = estado
+        pedido.update(campos)
+
+        if resumen["ultimo_pedido"]["id_orden"] == id_orden:
+            resumen["ultimo_pedido"]["estado"] = estado
+
+
+for _pedido in PEDIDOS.values():
+    _indexar_pedido(_pedido)
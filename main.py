@@ -3,26 +3,70 @@
 API FastAPI para el sistema de chat con MCP usando Gemini
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Header, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware  
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-import google.generativeai as genai
+from pydantic import BaseModel, model_validator
+from typing import List, Dict, Any, Optional, Literal
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 import json
+import time
+import asyncio
+import logging
 
-from tools import TOOLS, ejecutar_herramienta
+from tools import TOOLS, TOOL_FUNCTIONS, ejecutar_herramienta_async
+from database import INFO_PLATAFORMA
 from prompts import SYSTEM_PROMPT
+from compactar import compactar_resultado
+from tracing import configurar_logging, configurar_tracing, iniciar_span
+from sesiones import Sesion, ROL_USUARIO, ROL_ASISTENTE
+import snapshots
+import metricas
+from circuito import CircuitoAbierto, crear_circuito_gemini
+from modo_degradado import responder_sin_gemini
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Configurar logs estructurados y trazas
+configurar_logging(os.getenv("LOG_LEVEL", "INFO"))
+configurar_tracing()
+snapshots.configurar_snapshots()
+logger = logging.getLogger(__name__)
+
+# Estado del arranque: /ready responde 200 solo después del warm-up
+estado_app = {"listo": False}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Restaura las sesiones y hace el warm-up antes de aceptar tráfico"""
+    tarea_snapshots = None
+    detener_snapshots = asyncio.Event()
+
+    if snapshots.habilitado():
+        await restaurar_sesiones()
+        tarea_snapshots = asyncio.create_task(guardar_snapshots_periodicamente(detener_snapshots))
+
+    await calentar()
+    estado_app["listo"] = True
+    yield
+    estado_app["listo"] = False
+
+    if tarea_snapshots:
+        # La tarea guarda un último snapshot antes de terminar
+        detener_snapshots.set()
+        await tarea_snapshots
+
+
 # Inicializar FastAPI
 app = FastAPI(
     title="E-commerce MCP API (Gemini)",
     description="Sistema de chat con herramientas para soporte de e-commerce usando Gemini",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ==================== CONFIGURAR CORS ====================
@@ -34,14 +78,59 @@ app.add_middleware(
     allow_headers=["*"],  # Permitir todos los headers
 )
 
-# Configurar Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
 # CAMBIO IMPORTANTE: Usar el nombre correcto del modelo
 MODEL_NAME = "gemini-2.5-flash"  # ← Agregar -latest
 
+# Timeout de cada llamada a Gemini (segundos), menor que los del SDK
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+
+# Circuit breaker: con Gemini lento o caído se responde en modo degradado
+circuito_gemini = crear_circuito_gemini()
+metricas.describir("gemini_calls_total", "Llamadas a Gemini por resultado")
+
+# Cada cuánto (segundos) se verifica si el cliente de /chat sigue conectado
+INTERVALO_DESCONEXION = 0.5
+
 # Almacenamiento en memoria de conversaciones (por sesión)
-conversaciones: Dict[str, Any] = {}
+conversaciones: Dict[str, Sesion] = {}
+
+# Abrir la conexión con Gemini durante el warm-up (requiere API key válida)
+WARMUP_CONNECT = os.getenv("WARMUP_CONNECT", "0") == "1"
+
+# SDK de Gemini y modelos compartidos (se crean al primer uso o en el warm-up)
+_genai = None
+_modelo_chat = None
+_modelo_titulos = None
+
+
+def cargar_genai():
+    """Importa y configura el SDK de Gemini (import pesado, se difiere del arranque)"""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _genai = genai
+    return _genai
+
+
+def obtener_modelo_titulos():
+    """Retorna el modelo usado para generar nombres de sesión"""
+    global _modelo_titulos
+    if _modelo_titulos is None:
+        _modelo_titulos = cargar_genai().GenerativeModel(model_name=MODEL_NAME)
+    return _modelo_titulos
+
+
+def obtener_modelo_chat():
+    """Retorna el modelo de chat con herramientas, compartido entre sesiones"""
+    global _modelo_chat
+    if _modelo_chat is None:
+        _modelo_chat = cargar_genai().GenerativeModel(
+            model_name=MODEL_NAME,  # ← Usar la constante con -latest
+            tools=GEMINI_TOOLS,
+            system_instruction=SYSTEM_PROMPT
+        )
+    return _modelo_chat
 
 
 # Convertir herramientas al formato de Gemini
@@ -61,6 +150,10 @@ def convertir_tools_a_gemini(tools):
                 "type": param_info["type"].upper(),
                 "description": param_info["description"]
             }
+            if "items" in param_info:
+                gemini_parameters[param_name]["items"] = {
+                    "type": param_info["items"]["type"].upper()
+                }
         
         gemini_tool = {
             "name": tool["name"],
@@ -79,18 +172,167 @@ def convertir_tools_a_gemini(tools):
 async def generar_nombre_sesion(primer_mensaje: str) -> str:
     """Genera un nombre descriptivo para la sesión basado en el primer mensaje"""
     try:
-        model = genai.GenerativeModel(model_name=MODEL_NAME)
-        prompt = f"Genera un título corto (máximo 5 palabras) para esta conversación: '{primer_mensaje}'. Responde solo con el título, sin comillas ni puntuación adicional."
-        
-        response = model.generate_content(prompt)
-        nombre = response.text.strip()
-        return nombre[:50]  # Limitar longitud
-    except:
+        with iniciar_span("generar_nombre_sesion", **{"gen_ai.request.model": MODEL_NAME}) as span:
+            model = obtener_modelo_titulos()
+            prompt = f"Genera un título corto (máximo 5 palabras) para esta conversación: '{primer_mensaje}'. Responde solo con el título, sin comillas ni puntuación adicional."
+            
+            response = await llamar_gemini(lambda: model.generate_content_async(prompt))
+            registrar_uso_tokens(span, response)
+            nombre = response.text.strip()
+            return nombre[:50]  # Limitar longitud
+    except GeminiNoDisponible:
+        # Sin Gemini no tiene sentido esperar otro timeout en el mensaje: se pasa al modo degradado
+        raise
+    except Exception:
+        logger.warning("No se pudo generar el nombre de la sesión", exc_info=True)
         return f"Chat {primer_mensaje[:20]}..."
 
+
+def registrar_uso_tokens(span, response):
+    """Agrega al span el uso de tokens informado por Gemini"""
+    uso = getattr(response, "usage_metadata", None)
+    if uso:
+        span.set_atributo("gen_ai.usage.input_tokens", uso.prompt_token_count)
+        span.set_atributo("gen_ai.usage.output_tokens", uso.candidates_token_count)
+
+
+async def enviar_a_gemini(chat, contenido, iteration: int):
+    """Envía un mensaje a Gemini dentro de un span con el uso de tokens"""
+    with iniciar_span("gemini.send_message", **{
+        "gen_ai.request.model": MODEL_NAME,
+        "chat.iteration": iteration
+    }) as span:
+        response = await llamar_gemini(lambda: chat.send_message_async(contenido))
+        registrar_uso_tokens(span, response)
+        return response
+
+
+class GeminiNoDisponible(Exception):
+    """Gemini no respondió a tiempo, falló o el circuito está abierto"""
+
+
+def es_fallo_de_servicio(error: Exception) -> bool:
+    """
+    Solo timeouts, errores de conexión y errores de la API con código 429 o 5xx
+    indican que Gemini está lento o caído. El resto (respuestas bloqueadas,
+    4xx, errores de programación) no cuenta para el circuit breaker.
+    """
+    # Import diferido: el SDK ya está cargado cuando hay una llamada en curso
+    from google.api_core.exceptions import GoogleAPICallError
+
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, GoogleAPICallError):
+        codigo = error.code
+        return isinstance(codigo, int) and (codigo == 429 or codigo >= 500)
+    return False
+
+
+async def llamar_gemini(llamada):
+    """Ejecuta una llamada a Gemini a través del circuit breaker y con timeout"""
+    permitida, es_prueba = circuito_gemini.permitir()
+    if not permitida:
+        metricas.incrementar("gemini_calls_total", resultado="rechazada")
+        raise GeminiNoDisponible("Circuito abierto") from CircuitoAbierto()
+
+    inicio = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(llamada(), timeout=GEMINI_TIMEOUT)
+    except asyncio.CancelledError:
+        if es_prueba:
+            circuito_gemini.liberar()
+        raise
+    except Exception as e:
+        latencia = time.perf_counter() - inicio
+        if es_fallo_de_servicio(e):
+            circuito_gemini.registrar(False, latencia, es_prueba)
+            metricas.incrementar("gemini_calls_total", resultado="error")
+            raise GeminiNoDisponible(str(e) or type(e).__name__) from e
+        circuito_gemini.registrar(True, latencia, es_prueba)
+        raise
+
+    circuito_gemini.registrar(True, time.perf_counter() - inicio, es_prueba)
+    metricas.incrementar("gemini_calls_total", resultado="ok")
+    return response
+
+
+# ==================== SNAPSHOTS DE SESIONES ====================
+
+async def restaurar_sesiones():
+    """Carga las sesiones del último snapshot y compacta el archivo"""
+    with iniciar_span("snapshots.restaurar") as span:
+        inicio = time.perf_counter()
+        conversaciones.update(await asyncio.to_thread(snapshots.restaurar))
+        await asyncio.to_thread(snapshots.compactar_archivo, snapshots.snapshot_completo(conversaciones))
+
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        span.set_atributo("snapshots.sessions", len(conversaciones))
+        logger.info("Restauradas %d sesiones en %.1f ms", len(conversaciones), duracion_ms)
+
+
+async def guardar_snapshot():
+    """Guarda los cambios pendientes (o reescribe el archivo si creció demasiado)"""
+    if snapshots.necesita_compactar(conversaciones):
+        await asyncio.to_thread(snapshots.compactar_archivo, snapshots.snapshot_completo(conversaciones))
+    else:
+        await asyncio.to_thread(snapshots.escribir_lineas, snapshots.tomar_cambios(conversaciones))
+
+
+async def guardar_snapshots_periodicamente(detener: asyncio.Event):
+    """Guarda snapshots incrementales cada SNAPSHOT_INTERVAL segundos hasta que se detenga"""
+    while not detener.is_set():
+        try:
+            await asyncio.wait_for(detener.wait(), timeout=snapshots.intervalo())
+        except asyncio.TimeoutError:
+            pass
+
+        try:
+            await guardar_snapshot()
+        except Exception:
+            logger.exception("Error guardando el snapshot de sesiones")
+
+
 # Convertir tools
 GEMINI_TOOLS = convertir_tools_a_gemini(TOOLS)
 
+# Herramientas de solo lectura que se ejecutan una vez en el warm-up: arrancan
+# el pool de hilos y recorren la compactación (los resultados se descartan;
+# solo queda en caché el texto normalizado de las FAQ)
+HERRAMIENTAS_WARMUP = [
+    ("listar_productos", {}),
+    ("consultar_categorias", {}),
+    *[("consultar_info_plataforma", {"tipo_info": tipo}) for tipo in INFO_PLATAFORMA]
+]
+
+
+async def calentar():
+    """
+    Warm-up del arranque: carga el SDK, construye los modelos compartidos,
+    ejecuta una vez las herramientas de solo lectura y opcionalmente abre la conexión
+    """
+    with iniciar_span("warmup", **{"warmup.connect": WARMUP_CONNECT}) as span:
+        inicio = time.perf_counter()
+
+        cargar_genai()
+        obtener_modelo_chat()
+        obtener_modelo_titulos()
+
+        for nombre, argumentos in HERRAMIENTAS_WARMUP:
+            if nombre in TOOL_FUNCTIONS:
+                compactar_resultado(nombre, await ejecutar_herramienta_async(nombre, argumentos))
+
+        if WARMUP_CONNECT:
+            # count_tokens usa el mismo cliente async que send_message_async:
+            # deja hecho el handshake TLS y la resolución del modelo
+            try:
+                await obtener_modelo_chat().count_tokens_async("warm-up")
+            except Exception:
+                logger.warning("No se pudo abrir la conexión con Gemini en el warm-up", exc_info=True)
+
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        span.set_atributo("warmup.duration_ms", round(duracion_ms, 1))
+        logger.info("Warm-up completado en %.1f ms", duracion_ms)
+
 
 # Modelos Pydantic
 class Message(BaseModel):
@@ -107,12 +349,42 @@ class ChatResponse(BaseModel):
     session_id: str
     response: str
     tool_calls: Optional[List[Dict[str, Any]]] = None
+    degraded: bool = False
 
 
 class ClearSessionRequest(BaseModel):
     session_id: str
 
 
+class SessionTurn(BaseModel):
+    role: Literal["user", "assistant", "tool"]
+    content: str
+
+    @model_validator(mode="after")
+    def validar_herramienta(self):
+        """Los turnos "tool" guardan el JSON de la llamada: {"name", "args", "result"}"""
+        if self.role == "tool":
+            try:
+                llamada = json.loads(self.content)
+            except json.JSONDecodeError:
+                raise ValueError("El contenido de un turno 'tool' debe ser JSON")
+            if not isinstance(llamada, dict) or not {"name", "args", "result"} <= llamada.keys():
+                raise ValueError("Un turno 'tool' requiere 'name', 'args' y 'result'")
+            if not isinstance(llamada["name"], str) or not isinstance(llamada["args"], dict):
+                raise ValueError("En un turno 'tool', 'name' debe ser texto y 'args' un objeto")
+        return self
+
+
+class SessionData(BaseModel):
+    id: str
+    nombre: Optional[str] = None
+    turnos: List[SessionTurn] = []
+
+
+class ImportSessionsRequest(BaseModel):
+    sessions: List[SessionData]
+
+
 # Endpoints
 @app.get("/")
 def read_root():
@@ -123,6 +395,8 @@ def read_root():
         "model": MODEL_NAME,
         "endpoints": {
             "POST /chat": "Enviar un mensaje al asistente",
+            "GET /ready": "Readiness (200 después del warm-up)",
+            "GET /metrics": "Métricas en formato Prometheus",
             "POST /clear": "Limpiar una sesión de chat",
             "GET /sessions": "Listar sesiones activas",
             "GET /tools": "Listar herramientas disponibles"
@@ -130,6 +404,20 @@ def read_root():
     }
 
 
+@app.get("/ready")
+def readiness():
+    """Readiness para el load balancer: 503 hasta que termine el warm-up"""
+    if not estado_app["listo"]:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Métricas del circuit breaker y del modo degradado (formato Prometheus)"""
+    return metricas.exportar_prometheus()
+
+
 @app.get("/tools")
 def get_tools():
     """Retorna la lista de herramientas disponibles"""
@@ -141,14 +429,14 @@ def get_tools():
 
 
 @app.get("/sessions")
-def get_sessions():
+async def get_sessions():
     """Retorna las sesiones activas con sus nombres"""
     sessions_data = [
         {
             "id": session_id,
-            "name": data.get("session_name", f"Chat {session_id}")
+            "name": sesion.nombre or f"Chat {session_id}"
         }
-        for session_id, data in conversaciones.items()
+        for session_id, sesion in conversaciones.items()
     ]
     return {
         "sessions": sessions_data,
@@ -156,126 +444,191 @@ def get_sessions():
     }
 
 @app.get("/sessions/{session_id}/history")
-def get_session_history(session_id: str):
+async def get_session_history(session_id: str):
     """Retorna el historial de mensajes de una sesión"""
     if session_id not in conversaciones:
         return {"session_id": session_id, "history": [], "exists": False}
     
     return {
         "session_id": session_id,
-        "history": conversaciones[session_id]["history"],
+        "history": conversaciones[session_id].historial(),
         "exists": True
     }
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """
-    Endpoint principal de chat usando Gemini
-    Procesa un mensaje del usuario y retorna la respuesta del asistente
-    """
-    try:
-        session_id = request.session_id
-        user_message = request.message
+async def responder_degradado(request: ChatRequest) -> ChatResponse:
+    """Responde sin Gemini usando herramientas y plantillas, y guarda el intercambio"""
+    session_id = request.session_id
+    response_text, tool_calls_info = await responder_sin_gemini(request.message, ejecutar_herramienta_async)
+
+    if session_id not in conversaciones:
+        conversaciones[session_id] = Sesion(f"Chat {request.message[:20]}...")
+
+    sesion = conversaciones[session_id]
+    sesion.agregar_turno(ROL_USUARIO, request.message)
+    sesion.agregar_turno(ROL_ASISTENTE, response_text)
+    snapshots.marcar_modificada(session_id)
+
+    return ChatResponse(
+        session_id=session_id,
+        response=response_text,
+        tool_calls=tool_calls_info if tool_calls_info else None,
+        degraded=True
+    )
+
+
+async def procesar_chat(request: ChatRequest, root_span) -> ChatResponse:
+    """Procesa un mensaje del usuario, resolviendo las llamadas a herramientas"""
+    session_id = request.session_id
+    user_message = request.message
+    
+    # Una sesión nueva se registra recién al guardar el primer intercambio,
+    # así un request cancelado no deja una sesión vacía
+    sesion = conversaciones.get(session_id)
+    es_nueva = sesion is None
+    if es_nueva:
+        # Generar nombre automáticamente
+        sesion = Sesion(await generar_nombre_sesion(user_message))
+    
+    # El ChatSession se arma a partir del historial compacto y solo vive durante el request
+    chat = obtener_modelo_chat().start_chat(
+        history=sesion.historial_gemini(),
+        enable_automatic_function_calling=False
+    )
+    
+    # Enviar mensaje a Gemini
+    response = await enviar_a_gemini(chat, user_message, iteration=0)
+    
+    tool_calls_info = []
+    turnos_herramientas = []  # (nombre, argumentos, resultado compactado) para el historial
+    max_iterations = 10  # Prevenir loops infinitos
+    iteration = 0
+    
+    # Procesar la respuesta y manejar llamadas a herramientas
+    while response.candidates[0].content.parts[0].function_call and iteration < max_iterations:
+        iteration += 1
         
-        # Inicializar conversación si no existe
-        if session_id not in conversaciones:
-            # Generar nombre automáticamente
-            session_name = await generar_nombre_sesion(user_message)
-            # Crear modelo con configuración - USAR MODEL_NAME
-            model = genai.GenerativeModel(
-                model_name=MODEL_NAME,  # ← Usar la constante con -latest
-                tools=GEMINI_TOOLS,
-                system_instruction=SYSTEM_PROMPT
-            )
-            # Iniciar chat
-            conversaciones[session_id] = {
-                "chat": model.start_chat(enable_automatic_function_calling=False),
-                "history": [],
-                "session_name": session_name
-            }
+        # Obtener la llamada a la función
+        function_call = response.candidates[0].content.parts[0].function_call
+        tool_name = function_call.name
+        # Convertir los args (Struct de proto) a tipos nativos, incluyendo listas
+        tool_args = type(function_call).to_dict(function_call).get("args", {})
         
-        chat = conversaciones[session_id]["chat"]
-        history = conversaciones[session_id]["history"]
+        # Ejecutar la herramienta (con timeout; un timeout vuelve como resultado de error)
+        with iniciar_span(f"tool {tool_name}", **{
+            "session.id": session_id,
+            "tool.name": tool_name,
+            "chat.iteration": iteration
+        }) as tool_span:
+            result = await ejecutar_herramienta_async(tool_name, tool_args)
+            tool_span.set_atributo("tool.error", bool(result.get("error")))
+            tool_span.set_atributo("tool.timeout", bool(result.get("timeout")))
         
-        # Agregar mensaje del usuario al historial
-        history.append({
-            "role": "user",
-            "content": user_message
+        # Guardar información para el cliente
+        tool_calls_info.append({
+            "tool": tool_name,
+            "input": tool_args,
+            "result": result
         })
         
-        # Enviar mensaje a Gemini
-        response = chat.send_message(user_message)
-        
-        tool_calls_info = []
-        max_iterations = 10  # Prevenir loops infinitos
-        iteration = 0
-        
-        # Procesar la respuesta y manejar llamadas a herramientas
-        while response.candidates[0].content.parts[0].function_call and iteration < max_iterations:
-            iteration += 1
-            
-            # Obtener la llamada a la función
-            function_call = response.candidates[0].content.parts[0].function_call
-            tool_name = function_call.name
-            tool_args = dict(function_call.args)
-            
-            # Ejecutar la herramienta
-            result = ejecutar_herramienta(tool_name, tool_args)
-            
-            # Guardar información para el cliente
-            tool_calls_info.append({
-                "tool": tool_name,
-                "input": tool_args,
-                "result": result
-            })
-            
-            # Enviar el resultado de vuelta a Gemini
-            response = chat.send_message(
-                genai.protos.Content(
-                    parts=[
-                        genai.protos.Part(
-                            function_response=genai.protos.FunctionResponse(
-                                name=tool_name,
-                                response={"result": result}
-                            )
+        # Enviar el resultado compactado de vuelta a Gemini
+        result_compacto = compactar_resultado(tool_name, result)
+        turnos_herramientas.append((tool_name, tool_args, result_compacto))
+        protos = cargar_genai().protos
+        response = await enviar_a_gemini(
+            chat,
+            protos.Content(
+                parts=[
+                    protos.Part(
+                        function_response=protos.FunctionResponse(
+                            name=tool_name,
+                            response={"result": result_compacto}
                         )
-                    ]
-                )
-            )
-        
-        # Extraer texto de la respuesta final
-        response_text = ""
-        if response.candidates and len(response.candidates) > 0:
-            candidate = response.candidates[0]
-            if candidate.content and candidate.content.parts:
-                for part in candidate.content.parts:
-                    if hasattr(part, 'text') and part.text:
-                        response_text += part.text
-        
-        # Si no hay texto, usar un mensaje por defecto
-        if not response_text:
-            response_text = "Lo siento, no pude generar una respuesta adecuada."
-        
-        # Agregar respuesta al historial
-        history.append({
-            "role": "assistant",
-            "content": response_text
-        })
-        
-        return ChatResponse(
-            session_id=session_id,
-            response=response_text,
-            tool_calls=tool_calls_info if tool_calls_info else None
+                    )
+                ]
+            ),
+            iteration=iteration
         )
+    
+    # Extraer texto de la respuesta final
+    response_text = ""
+    if response.candidates and len(response.candidates) > 0:
+        candidate = response.candidates[0]
+        if candidate.content and candidate.content.parts:
+            for part in candidate.content.parts:
+                if hasattr(part, 'text') and part.text:
+                    response_text += part.text
+    
+    root_span.set_atributo("chat.iterations", iteration)
+    
+    # Si no hay texto, usar un mensaje por defecto
+    if not response_text:
+        response_text = "Lo siento, no pude generar una respuesta adecuada."
+    
+    # Agregar el intercambio al historial (solo si se completó).
+    # Si la sesión se limpió o eliminó durante el request, no se revive
+    if es_nueva:
+        sesion = conversaciones.setdefault(session_id, sesion)
+    if conversaciones.get(session_id) is sesion:
+        sesion.agregar_turno(ROL_USUARIO, user_message)
+        for tool_name, tool_args, result_compacto in turnos_herramientas:
+            sesion.agregar_herramienta(tool_name, tool_args, result_compacto)
+        sesion.agregar_turno(ROL_ASISTENTE, response_text)
+        snapshots.marcar_modificada(session_id)
+    else:
+        logger.info("La sesión %s se eliminó durante el request, no se guarda el intercambio", session_id)
+    
+    return ChatResponse(
+        session_id=session_id,
+        response=response_text,
+        tool_calls=tool_calls_info if tool_calls_info else None
+    )
+
+
+class ClienteDesconectado(Exception):
+    """El cliente cerró la conexión antes de recibir la respuesta"""
+
+
+async def cancelar_si_desconecta(coro, http_request: Request):
+    """Ejecuta una corrutina y la cancela si el cliente HTTP se desconecta"""
+    tarea = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({tarea}, timeout=INTERVALO_DESCONEXION)
+            if done:
+                return tarea.result()
+            if await http_request.is_disconnected():
+                tarea.cancel()
+                raise ClienteDesconectado()
+    finally:
+        if not tarea.done():
+            tarea.cancel()
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request):
+    """
+    Endpoint principal de chat usando Gemini
+    Procesa un mensaje del usuario y retorna la respuesta del asistente
+    """
+    with iniciar_span("POST /chat", **{"session.id": request.session_id}) as root_span:
+        try:
+            return await cancelar_si_desconecta(procesar_chat(request, root_span), http_request)
         
-    except Exception as e:
-        print(f"Error detallado: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+        except GeminiNoDisponible as e:
+            logger.warning("Gemini no disponible (%s), respondiendo en modo degradado", e)
+            root_span.set_atributo("chat.degraded", True)
+            return await responder_degradado(request)
+        except ClienteDesconectado:
+            logger.info("Cliente desconectado, se canceló el chat de la sesión %s", request.session_id)
+            raise HTTPException(status_code=499, detail="Cliente desconectado")
+        except Exception as e:
+            logger.exception("Error procesando el chat de la sesión %s", request.session_id)
+            raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 
 @app.post("/clear")
-def clear_session(request: ClearSessionRequest):
+async def clear_session(request: ClearSessionRequest):
     """
     Limpia el historial de una sesión
     """
@@ -283,6 +636,7 @@ def clear_session(request: ClearSessionRequest):
     
     if session_id in conversaciones:
         del conversaciones[session_id]
+        snapshots.marcar_eliminada(session_id)
         return {
             "message": f"Sesión {session_id} limpiada exitosamente",
             "success": True
@@ -295,12 +649,13 @@ def clear_session(request: ClearSessionRequest):
 
 
 @app.delete("/sessions/{session_id}")
-def delete_session(session_id: str):
+async def delete_session(session_id: str):
     """
     Elimina una sesión específica
     """
     if session_id in conversaciones:
         del conversaciones[session_id]
+        snapshots.marcar_eliminada(session_id)
         return {
             "message": f"Sesión {session_id} eliminada",
             "success": True
@@ -309,6 +664,43 @@ def delete_session(session_id: str):
         raise HTTPException(status_code=404, detail="Sesión no encontrada")
 
 
+# ==================== ADMINISTRACIÓN ====================
+
+def verificar_admin(x_admin_token: Optional[str] = Header(None)):
+    """Los endpoints de administración requieren ADMIN_TOKEN (deshabilitados si no está configurado)"""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Endpoints de administración deshabilitados (configurar ADMIN_TOKEN)")
+    if x_admin_token != token:
+        raise HTTPException(status_code=401, detail="Token de administración inválido")
+
+
+@app.get("/admin/sessions/export", dependencies=[Depends(verificar_admin)])
+async def export_sessions():
+    """
+    Exporta todas las sesiones con su historial
+    """
+    sessions_data = snapshots.exportar(conversaciones)
+    return {
+        "sessions": sessions_data,
+        "count": len(sessions_data)
+    }
+
+
+@app.post("/admin/sessions/import", dependencies=[Depends(verificar_admin)])
+async def import_sessions(request: ImportSessionsRequest):
+    """
+    Importa sesiones exportadas (reemplaza las que tengan el mismo ID)
+    """
+    # El body ya fue validado completo por Pydantic antes de modificar nada
+    count = snapshots.importar(conversaciones, [session.model_dump() for session in request.sessions])
+
+    return {
+        "message": f"{count} sesión(es) importada(s)",
+        "success": True
+    }
+
+
 # Ejecutar con: uvicorn main:app --reload
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,67 @@
+# metricas.py
+"""
+Métricas en memoria expuestas en formato de texto de Prometheus
+"""
+
+import threading
+from typing import Dict, Tuple, Callable
+
+# (nombre, etiquetas ordenadas) -> valor
+_contadores: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+# Gauges que se calculan al exportar: nombre -> función que retorna el valor
+_gauges: Dict[str, Callable[[], float]] = {}
+
+# Descripciones para las líneas # HELP
+_descripciones: Dict[str, str] = {}
+
+_lock = threading.Lock()
+
+
+def describir(nombre: str, descripcion: str):
+    """Registra la descripción de una métrica"""
+    _descripciones[nombre] = descripcion
+
+
+def incrementar(nombre: str, valor: float = 1, **etiquetas: str):
+    """Incrementa un contador (con etiquetas opcionales)"""
+    clave = (nombre, tuple(sorted(etiquetas.items())))
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def registrar_gauge(nombre: str, funcion: Callable[[], float]):
+    """Registra un gauge cuyo valor se obtiene al momento de exportar"""
+    _gauges[nombre] = funcion
+
+
+def _formatear(nombre: str, etiquetas: Tuple[Tuple[str, str], ...], valor: float) -> str:
+    if etiquetas:
+        texto = ",".join(f'{clave}="{valor_etiqueta}"' for clave, valor_etiqueta in etiquetas)
+        return f"{nombre}{{{texto}}} {valor:g}"
+    return f"{nombre} {valor:g}"
+
+
+def exportar_prometheus() -> str:
+    """Retorna todas las métricas en formato de texto de Prometheus"""
+    lineas = []
+
+    with _lock:
+        contadores = sorted(_contadores.items())
+
+    nombres_vistos = set()
+    for (nombre, etiquetas), valor in contadores:
+        if nombre not in nombres_vistos:
+            nombres_vistos.add(nombre)
+            if nombre in _descripciones:
+                lineas.append(f"# HELP {nombre} {_descripciones[nombre]}")
+            lineas.append(f"# TYPE {nombre} counter")
+        lineas.append(_formatear(nombre, etiquetas, valor))
+
+    for nombre, funcion in sorted(_gauges.items()):
+        if nombre in _descripciones:
+            lineas.append(f"# HELP {nombre} {_descripciones[nombre]}")
+        lineas.append(f"# TYPE {nombre} gauge")
+        lineas.append(_formatear(nombre, (), funcion()))
+
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,190 @@
+# modo_degradado.py
+"""
+Respuestas sin Gemini: cuando el circuito está abierto se reconocen las
+intenciones más comunes, se responden con las herramientas y plantillas,
+y el resto recibe una disculpa con los datos de contacto
+"""
+
+import re
+import unicodedata
+from typing import Dict, Any, List, Optional, Tuple
+
+from database import PRODUCTOS, INFO_PLATAFORMA
+from compactar import colapsar_espacios
+import metricas
+
+metricas.describir("degraded_responses_total", "Respuestas generadas en modo degradado (sin Gemini)")
+
+_ID_ORDEN = re.compile(r"\bord-?\s?(\d+)\b", re.IGNORECASE)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_TALLE = re.compile(r"\btalle\s+([a-z0-9]+)", re.IGNORECASE)
+
+# Palabras clave (sin acentos) -> tipo de INFO_PLATAFORMA
+PALABRAS_INFO = [
+    (("devol", "devuelv", "reembols", "cambi"), "politica_devolucion"),
+    (("cuota", "financ", "ahora 12", "ahora 18"), "financiacion"),
+    (("pago", "pagar", "tarjeta", "mercado pago", "transferencia", "efectivo"), "metodos_pago"),
+    (("envio", "envian", "despach", "retiro", "llega"), "envios"),
+    (("contacto", "telefono", "whatsapp", "horario", "hablar con"), "contacto")
+]
+
+PALABRAS_HISTORIAL = ("historial", "mis compras", "mis pedidos", "en camino", "pendiente")
+
+MENSAJE_DISCULPA = (
+    "Lo siento, en este momento nuestro asistente tiene una demora mayor a la habitual "
+    "y no puedo responder esa consulta. Puedo ayudarte ahora mismo con stock de productos, "
+    "el estado de un pedido (indicando su número, ej: ORD-001) o información de pagos, "
+    "envíos y devoluciones. También puedes contactarnos:\n\n{contacto}"
+)
+
+
+def _normalizar(texto: str) -> str:
+    """Pasa a minúsculas y elimina acentos para comparar palabras clave"""
+    sin_acentos = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in sin_acentos if not unicodedata.combining(c))
+
+
+def _buscar_producto(texto: str) -> Optional[str]:
+    """Retorna la clave del producto mencionado (en singular o plural)"""
+    for clave in PRODUCTOS:
+        singular = clave[:-1] if clave.endswith("s") else clave
+        if re.search(rf"\b{singular}(e?s)?\b", texto):
+            return clave
+    return None
+
+
+def _buscar_talle(producto: str, talle: str) -> str:
+    """Retorna el talle tal como está cargado en el producto (sin distinguir mayúsculas ni acentos)"""
+    for clave in PRODUCTOS[producto]["talles"]:
+        if _normalizar(clave) == talle:
+            return clave
+    # Talle inexistente: consultar_stock responde con los talles disponibles
+    return talle.upper()
+
+
+def detectar_intencion(mensaje: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Retorna (herramienta, argumentos) para las intenciones reconocibles, o None"""
+    texto = _normalizar(mensaje)
+
+    ids = [f"ORD-{numero.zfill(3)}" for numero in _ID_ORDEN.findall(texto)]
+    if len(ids) == 1:
+        return "rastrear_pedido", {"id_orden": ids[0]}
+    if ids:
+        return "rastrear_pedidos", {"ids_orden": ids}
+
+    email = _EMAIL.search(mensaje)
+    if email and any(palabra in texto for palabra in PALABRAS_HISTORIAL):
+        return "obtener_historial_compras", {"email": email.group(0), "solo_resumen": True}
+
+    # Devoluciones y cambios antes que productos: "quiero cambiar la zapatilla"
+    palabras_devolucion, tipo_devolucion = PALABRAS_INFO[0]
+    if any(palabra in texto for palabra in palabras_devolucion):
+        return "consultar_info_plataforma", {"tipo_info": tipo_devolucion}
+
+    producto = _buscar_producto(texto)
+    if producto:
+        talle = _TALLE.search(texto)
+        if talle:
+            return "consultar_stock", {"producto": producto, "talle": _buscar_talle(producto, talle.group(1))}
+        return "listar_productos", {}
+
+    for palabras, tipo in PALABRAS_INFO:
+        if any(palabra in texto for palabra in palabras):
+            return "consultar_info_plataforma", {"tipo_info": tipo}
+
+    return None
+
+
+# ==================== PLANTILLAS ====================
+
+def _plantilla_stock(resultado: Dict[str, Any], argumentos: Dict[str, Any]) -> str:
+    if resultado["disponible"]:
+        return (f"¡Sí! Tenemos {resultado['stock']} unidades de {resultado['producto']} "
+                f"en talle {resultado['talle']} a ${resultado['precio']:,}.")
+    return f"Por ahora no tenemos stock de {resultado['producto']} en talle {resultado['talle']}."
+
+
+def _plantilla_productos(resultado: Dict[str, Any], argumentos: Dict[str, Any]) -> str:
+    lineas = [
+        f"- {p['nombre']} (${p['precio']:,}): talles {', '.join(p['talles_disponibles']) or 'sin stock'}"
+        for p in resultado["productos"]
+    ]
+    return "Estos son nuestros productos disponibles:\n" + "\n".join(lineas)
+
+
+def _describir_pedido(pedido: Dict[str, Any]) -> str:
+    texto = f"Pedido {pedido['id']}: {pedido['estado']} ({', '.join(pedido['productos'])})"
+    if pedido.get("tracking"):
+        texto += f". {pedido['tracking']}"
+    if pedido.get("fecha_entrega"):
+        texto += f". Entregado el {pedido['fecha_entrega']}"
+    return texto + "."
+
+
+def _plantilla_pedido(resultado: Dict[str, Any], argumentos: Dict[str, Any]) -> str:
+    return _describir_pedido(resultado)
+
+
+def _plantilla_pedidos(resultado: Dict[str, Any], argumentos: Dict[str, Any]) -> str:
+    lineas = [f"- {_describir_pedido(pedido)}" for pedido in resultado["pedidos"]]
+    if resultado["no_encontrados"]:
+        lineas.append(f"No encontramos: {', '.join(resultado['no_encontrados'])}.")
+    return "\n".join(lineas)
+
+
+def _plantilla_historial(resultado: Dict[str, Any], argumentos: Dict[str, Any]) -> str:
+    resumen = resultado["resumen"]
+    texto = f"Tienes {resumen['total_pedidos']} pedido(s) con nosotros."
+    abiertos = resumen["abiertos_por_estado"]
+    if abiertos:
+        detalle = "; ".join(f"{estado}: {', '.join(ids)}" for estado, ids in abiertos.items())
+        texto += f" Pedidos abiertos: {detalle}."
+    else:
+        texto += " No tienes pedidos pendientes de entrega."
+    return texto
+
+
+def _plantilla_info(resultado: Dict[str, Any], argumentos: Dict[str, Any]) -> str:
+    return colapsar_espacios(resultado["informacion"])
+
+
+PLANTILLAS = {
+    "consultar_stock": _plantilla_stock,
+    "listar_productos": _plantilla_productos,
+    "rastrear_pedido": _plantilla_pedido,
+    "rastrear_pedidos": _plantilla_pedidos,
+    "obtener_historial_compras": _plantilla_historial,
+    "consultar_info_plataforma": _plantilla_info
+}
+
+
+def renderizar(nombre: str, resultado: Dict[str, Any], argumentos: Dict[str, Any]) -> str:
+    """Convierte el resultado de una herramienta en texto para el cliente"""
+    if resultado.get("error"):
+        return resultado["mensaje"]
+    return PLANTILLAS[nombre](resultado, argumentos)
+
+
+def mensaje_disculpa() -> str:
+    """Disculpa rápida con los datos de contacto"""
+    return MENSAJE_DISCULPA.format(contacto=colapsar_espacios(INFO_PLATAFORMA["contacto"]))
+
+
+async def responder_sin_gemini(mensaje: str, ejecutar) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Responde un mensaje sin usar Gemini.
+    `ejecutar` es la función async que ejecuta herramientas (nombre, argumentos).
+    Retorna el texto y la información de herramientas usadas.
+    """
+    intencion = detectar_intencion(mensaje)
+
+    if intencion is None:
+        metricas.incrementar("degraded_responses_total", tipo="disculpa")
+        return mensaje_disculpa(), []
+
+    nombre, argumentos = intencion
+    resultado = await ejecutar(nombre, argumentos)
+    metricas.incrementar("degraded_responses_total", tipo="herramienta", herramienta=nombre)
+
+    texto = renderizar(nombre, resultado, argumentos)
+    return texto, [{"tool": nombre, "input": argumentos, "result": resultado}]
@@ -0,0 +1,168 @@
+# sesiones.py
+"""
+Representación compacta de las sesiones de chat en memoria
+"""
+
+import base64
+import json
+import os
+import sys
+import zlib
+from typing import Dict, Any, List, Union
+
+# Roles internados: todas las sesiones comparten la misma instancia de cada string
+ROL_USUARIO = sys.intern("user")
+ROL_ASISTENTE = sys.intern("assistant")
+ROL_HERRAMIENTA = sys.intern("tool")
+ROLES_VALIDOS = (ROL_USUARIO, ROL_ASISTENTE, ROL_HERRAMIENTA)
+
+# Gemini llama "model" al rol del asistente
+ROLES_GEMINI = {ROL_USUARIO: "user", ROL_ASISTENTE: "model"}
+
+# Guardar las llamadas a herramientas (function_call + function_response) entre requests
+GUARDAR_TURNOS_HERRAMIENTAS = os.getenv("SESSION_KEEP_TOOL_TURNS", "1") == "1"
+
+# Turnos recientes que se mantienen sin comprimir
+TURNOS_CALIENTES = int(os.getenv("SESSION_HOT_TURNS", "6"))
+
+# Máximo de turnos que se guardan por sesión (se descartan los más antiguos)
+MAX_TURNOS = int(os.getenv("SESSION_MAX_TURNS", "200"))
+
+# Comprimir con zlib los turnos fríos (más antiguos que TURNOS_CALIENTES)
+COMPRIMIR_TURNOS_FRIOS = os.getenv("SESSION_COMPRESS_COLD", "1") == "1"
+
+# Por debajo de este tamaño comprimir no ahorra memoria
+MIN_BYTES_COMPRESION = 64
+
+
+class Turno:
+    """Un mensaje de la conversación; el contenido puede estar comprimido"""
+
+    __slots__ = ("rol", "_contenido")
+
+    def __init__(self, rol: str, contenido: Union[str, bytes]):
+        self.rol = sys.intern(rol)
+        self._contenido = contenido
+
+    @property
+    def contenido(self) -> str:
+        """Texto del mensaje (descomprimido si hace falta)"""
+        if isinstance(self._contenido, bytes):
+            return zlib.decompress(self._contenido).decode("utf-8")
+        return self._contenido
+
+    @property
+    def comprimido(self) -> bool:
+        return isinstance(self._contenido, bytes)
+
+    def comprimir(self):
+        """Comprime el contenido si efectivamente reduce su tamaño"""
+        if self.comprimido:
+            return
+
+        datos = self._contenido.encode("utf-8")
+        if len(datos) < MIN_BYTES_COMPRESION:
+            return
+
+        comprimido = zlib.compress(datos, 6)
+        if len(comprimido) < len(datos):
+            self._contenido = comprimido
+
+    def a_lista(self) -> List[str]:
+        """Serializa el turno tal como está guardado: [rol, texto] o [rol, base64, "z"]"""
+        if self.comprimido:
+            return [self.rol, base64.b64encode(self._contenido).decode("ascii"), "z"]
+        return [self.rol, self._contenido]
+
+    @classmethod
+    def desde_lista(cls, datos: List[str]) -> "Turno":
+        """Reconstruye un turno serializado con a_lista (sin volver a comprimir)"""
+        if len(datos) > 2 and datos[2] == "z":
+            return cls(datos[0], base64.b64decode(datos[1]))
+        return cls(datos[0], datos[1])
+
+
+class Sesion:
+    """
+    Sesión de chat: nombre e historial de turnos.
+    Es la única copia del historial; el ChatSession de Gemini se arma por request.
+    `pendientes` cuenta los turnos nuevos que todavía no se guardaron en el snapshot.
+    """
+
+    __slots__ = ("nombre", "turnos", "pendientes")
+
+    def __init__(self, nombre: str, turnos: List[Turno] = None):
+        self.nombre = nombre
+        self.turnos: List[Turno] = turnos if turnos is not None else []
+        self.pendientes = 0
+
+    def agregar_turno(self, rol: str, contenido: str):
+        """Agrega un turno, comprime el que pasa a ser frío y acota el historial"""
+        self.turnos.append(Turno(rol, contenido))
+        self.pendientes += 1
+
+        if COMPRIMIR_TURNOS_FRIOS and len(self.turnos) > TURNOS_CALIENTES:
+            self.turnos[-TURNOS_CALIENTES - 1].comprimir()
+
+        self.acotar()
+
+    def acotar(self):
+        """Descarta los turnos más antiguos si se supera MAX_TURNOS"""
+        if len(self.turnos) > MAX_TURNOS:
+            del self.turnos[:len(self.turnos) - MAX_TURNOS]
+
+    def comprimir_frios(self):
+        """Comprime todos los turnos fuera de la ventana caliente"""
+        if COMPRIMIR_TURNOS_FRIOS:
+            for turno in self.turnos[:-TURNOS_CALIENTES or None]:
+                turno.comprimir()
+
+    def agregar_herramienta(self, nombre: str, argumentos: Dict[str, Any], resultado: Dict[str, Any]):
+        """
+        Agrega una llamada a herramienta como un único turno "tool" con el JSON compacto
+        de la llamada y su resultado (ya compactado para Gemini)
+        """
+        if not GUARDAR_TURNOS_HERRAMIENTAS:
+            return
+
+        contenido = json.dumps(
+            {"name": nombre, "args": argumentos, "result": resultado},
+            ensure_ascii=False, separators=(",", ":"), default=str
+        )
+        self.agregar_turno(ROL_HERRAMIENTA, contenido)
+
+    def historial(self, incluir_herramientas: bool = False) -> List[Dict[str, str]]:
+        """Historial en el formato que consume el cliente (sin los turnos de herramientas)"""
+        return [
+            {"role": turno.rol, "content": turno.contenido}
+            for turno in self.turnos
+            if incluir_herramientas or turno.rol != ROL_HERRAMIENTA
+        ]
+
+    def historial_gemini(self) -> List[Dict[str, Any]]:
+        """
+        Historial en el formato que acepta GenerativeModel.start_chat.
+        Cada turno "tool" se expande en el function_call del modelo y su function_response.
+        """
+        contenidos: List[Dict[str, Any]] = []
+
+        for turno in self.turnos:
+            # Si MAX_TURNOS recortó el inicio, el historial debe empezar por un mensaje del usuario
+            if not contenidos and turno.rol != ROL_USUARIO:
+                continue
+
+            if turno.rol != ROL_HERRAMIENTA:
+                contenidos.append({"role": ROLES_GEMINI[turno.rol], "parts": [turno.contenido]})
+                continue
+
+            llamada = json.loads(turno.contenido)
+            contenidos.append({
+                "role": "model",
+                "parts": [{"function_call": {"name": llamada["name"], "args": llamada["args"]}}]
+            })
+            contenidos.append({
+                "role": "user",
+                "parts": [{"function_response": {"name": llamada["name"], "response": {"result": llamada["result"]}}}]
+            })
+
+        return contenidos
@@ -0,0 +1,231 @@
+# snapshots.py
+"""
+Snapshots incrementales de sesiones en un archivo JSON lines append-only,
+para recuperar las conversaciones al reiniciar la API
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, List, Set
+
+from sesiones import Sesion, Turno, ROLES_VALIDOS
+
+logger = logging.getLogger(__name__)
+
+# Configuración (se completa en configurar_snapshots)
+_config: Dict[str, Any] = {
+    "archivo": "sessions.jsonl",
+    "intervalo": 30.0,       # Segundos entre snapshots incrementales
+    "habilitado": True
+}
+
+# Sesiones con cambios sin guardar y sesiones eliminadas desde el último snapshot
+_sucias: Set[str] = set()
+_eliminadas: Set[str] = set()
+
+# Líneas escritas desde la última compactación del archivo
+_lineas_archivo = 0
+
+_lock_archivo = threading.Lock()
+
+# Tipos de registro:
+#   {"id", "nombre", "turnos", "completo": true} -> estado completo de la sesión
+#   {"id", "nombre", "turnos"}                   -> turnos nuevos a agregar
+#   {"id", "eliminada": true}                    -> la sesión se borró
+
+
+def configurar_snapshots():
+    """Lee la configuración de snapshots desde variables de entorno"""
+    _config["archivo"] = os.getenv("SNAPSHOT_FILE", "sessions.jsonl")
+    _config["intervalo"] = float(os.getenv("SNAPSHOT_INTERVAL", "30"))
+    _config["habilitado"] = os.getenv("SNAPSHOT_ENABLED", "1") == "1"
+
+
+def habilitado() -> bool:
+    return _config["habilitado"]
+
+
+def intervalo() -> float:
+    return _config["intervalo"]
+
+
+def marcar_modificada(session_id: str):
+    """Registra que una sesión tiene turnos nuevos para el próximo snapshot"""
+    _eliminadas.discard(session_id)
+    _sucias.add(session_id)
+
+
+def marcar_eliminada(session_id: str):
+    """Registra que una sesión se borró"""
+    _sucias.discard(session_id)
+    _eliminadas.add(session_id)
+
+
+def registro_completo(session_id: str, sesion: Sesion) -> Dict[str, Any]:
+    """Registro con el estado completo de una sesión (turnos fríos comprimidos)"""
+    return {
+        "id": session_id,
+        "nombre": sesion.nombre,
+        "turnos": [turno.a_lista() for turno in sesion.turnos],
+        "completo": True
+    }
+
+
+def _a_linea(registro: Dict[str, Any]) -> str:
+    return json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def tomar_cambios(conversaciones: Dict[str, Sesion]) -> List[str]:
+    """
+    Arma las líneas del snapshot incremental (solo turnos nuevos y borrados)
+    y deja las sesiones como guardadas. Debe llamarse desde el event loop.
+    """
+    lineas = [_a_linea({"id": session_id, "eliminada": True}) for session_id in _eliminadas]
+
+    for session_id in _sucias:
+        sesion = conversaciones.get(session_id)
+        if sesion is None or not sesion.pendientes:
+            continue
+
+        if sesion.pendientes >= len(sesion.turnos):
+            # Sesión nueva (o recreada tras borrarse): se guarda completa
+            lineas.append(_a_linea(registro_completo(session_id, sesion)))
+        else:
+            nuevos = sesion.turnos[-sesion.pendientes:]
+            lineas.append(_a_linea({
+                "id": session_id,
+                "nombre": sesion.nombre,
+                "turnos": [turno.a_lista() for turno in nuevos]
+            }))
+        sesion.pendientes = 0
+
+    _sucias.clear()
+    _eliminadas.clear()
+    return lineas
+
+
+def escribir_lineas(lineas: List[str]):
+    """Agrega líneas al archivo de snapshots (puede correr en un hilo)"""
+    global _lineas_archivo
+    if not lineas:
+        return
+
+    with _lock_archivo:
+        with open(_config["archivo"], "a", encoding="utf-8") as f:
+            f.writelines(lineas)
+            f.flush()
+            os.fsync(f.fileno())
+        _lineas_archivo += len(lineas)
+
+
+def necesita_compactar(conversaciones: Dict[str, Sesion]) -> bool:
+    """El archivo se reescribe cuando acumula muchos más registros que sesiones"""
+    return _lineas_archivo > 2 * len(conversaciones) + 1000
+
+
+def compactar_archivo(lineas: List[str]):
+    """Reescribe el archivo de forma atómica con un registro completo por sesión"""
+    global _lineas_archivo
+    temporal = _config["archivo"] + ".tmp"
+
+    with _lock_archivo:
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.writelines(lineas)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, _config["archivo"])
+        _lineas_archivo = len(lineas)
+
+
+def snapshot_completo(conversaciones: Dict[str, Sesion]) -> List[str]:
+    """Líneas con el estado completo de todas las sesiones (para compactar)"""
+    _sucias.clear()
+    _eliminadas.clear()
+
+    lineas = []
+    for session_id, sesion in conversaciones.items():
+        sesion.pendientes = 0
+        lineas.append(_a_linea(registro_completo(session_id, sesion)))
+    return lineas
+
+
+def restaurar() -> Dict[str, Sesion]:
+    """
+    Reconstruye las sesiones a partir del archivo de snapshots.
+    Los ChatSession no se crean acá: se arman en el primer mensaje de cada sesión.
+    """
+    global _lineas_archivo
+    sesiones: Dict[str, Sesion] = {}
+
+    if not os.path.exists(_config["archivo"]):
+        return sesiones
+
+    lineas = 0
+    with open(_config["archivo"], encoding="utf-8") as f:
+        for linea in f:
+            lineas += 1
+            try:
+                registro = json.loads(linea)
+                session_id = registro["id"]
+                if registro.get("eliminada"):
+                    sesiones.pop(session_id, None)
+                    continue
+
+                nombre = registro["nombre"]
+                for datos in registro["turnos"]:
+                    # Un turno con rol o contenido inválido rompería el historial de Gemini
+                    if datos[0] not in ROLES_VALIDOS or not isinstance(datos[1], str):
+                        raise ValueError(f"Turno inválido: {datos!r}")
+                turnos = [Turno.desde_lista(datos) for datos in registro["turnos"]]
+            except (json.JSONDecodeError, KeyError, TypeError, IndexError, ValueError):
+                # Una escritura interrumpida puede dejar la última línea incompleta,
+                # y un registro sin los campos esperados no debe impedir el arranque
+                logger.warning("Línea %d inválida en %s, se ignora", lineas, _config["archivo"])
+                continue
+
+            sesion = sesiones.get(session_id)
+
+            if sesion is None or registro.get("completo"):
+                sesiones[session_id] = Sesion(nombre, turnos)
+            else:
+                sesion.turnos.extend(turnos)
+
+    # Los turnos que llegaron en registros incrementales todavía no están comprimidos
+    for sesion in sesiones.values():
+        sesion.acotar()
+        sesion.comprimir_frios()
+
+    _lineas_archivo = lineas
+    return sesiones
+
+
+def exportar(conversaciones: Dict[str, Sesion]) -> List[Dict[str, Any]]:
+    """Exporta las sesiones en un formato legible (sin comprimir)"""
+    return [
+        {"id": session_id, "nombre": sesion.nombre, "turnos": sesion.historial(incluir_herramientas=True)}
+        for session_id, sesion in conversaciones.items()
+    ]
+
+
+def importar(conversaciones: Dict[str, Sesion], datos: List[Dict[str, Any]]) -> int:
+    """
+    Importa sesiones exportadas con `exportar`, reemplazando las existentes con el mismo ID.
+    Si algún item es inválido no se modifica ninguna sesión.
+    """
+    nuevas: Dict[str, Sesion] = {}
+    for item in datos:
+        sesion = Sesion(item.get("nombre") or f"Chat {item['id']}")
+        for turno in item.get("turnos", []):
+            if turno["role"] not in ROLES_VALIDOS or not isinstance(turno["content"], str):
+                raise ValueError(f"Turno inválido en la sesión {item['id']}")
+            sesion.agregar_turno(turno["role"], turno["content"])
+        nuevas[item["id"]] = sesion
+
+    for session_id, sesion in nuevas.items():
+        conversaciones[session_id] = sesion
+        # Todos sus turnos quedan pendientes: el próximo snapshot la guarda completa
+        marcar_modificada(session_id)
+
+    return len(nuevas)
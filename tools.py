@@ -3,8 +3,15 @@
 Herramientas (Tools) para el agente de soporte
 """
 
-from database import PRODUCTOS, CATEGORIAS, PEDIDOS, INFO_PLATAFORMA
-from typing import Dict, Any
+from database import PRODUCTOS, CATEGORIAS, PEDIDOS, INFO_PLATAFORMA, PEDIDOS_POR_CLIENTE, RESUMENES_CLIENTES, LOCK_PEDIDOS
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import copy
+import functools
+import inspect
+import os
 
 # Definición de las herramientas para Claude
 TOOLS = [
@@ -56,6 +63,21 @@ TOOLS = [
             "required": ["id_orden"]
         }
     },
+    {
+        "name": "rastrear_pedidos",
+        "description": "Rastrea varios pedidos a la vez usando una lista de IDs de orden. Usar en lugar de rastrear_pedido cuando el cliente consulta por más de un pedido.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "ids_orden": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Lista de IDs de orden a rastrear (formato: ORD-XXX)"
+                }
+            },
+            "required": ["ids_orden"]
+        }
+    },
     {
         "name": "explicar_politica_devolucion",
         "description": "Explica la política completa de devoluciones y cambios de la tienda.",
@@ -80,13 +102,21 @@ TOOLS = [
     },
     {
         "name": "obtener_historial_compras",
-        "description": "Obtiene el historial completo de compras de un cliente usando su email. Muestra todos los pedidos anteriores con sus estados, productos y fechas.",
+        "description": "Obtiene el historial de compras de un cliente usando su email. Retorna los pedidos con sus estados, productos y fechas. Para preguntas como '¿tengo algo en camino?' usar solo_resumen, que retorna solo un resumen (cantidad de pedidos, último pedido y pedidos abiertos por estado).",
         "input_schema": {
             "type": "object",
             "properties": {
                 "email": {
                     "type": "string",
                     "description": "Email del cliente para buscar su historial de compras"
+                },
+                "estado": {
+                    "type": "string",
+                    "description": "Opcional. Filtra los pedidos por estado (ej: 'En preparación', 'En camino', 'Entregado')"
+                },
+                "solo_resumen": {
+                    "type": "boolean",
+                    "description": "Opcional. Si es true, retorna solo el resumen sin listar los pedidos"
                 }
             },
             "required": ["email"]
@@ -181,14 +211,16 @@ def rastrear_pedido(id_orden: str) -> Dict[str, Any]:
     try:
         id_orden = id_orden.upper()
         
-        if id_orden not in PEDIDOS:
+        # Copiamos el pedido bajo el lock: puede actualizarse desde otro hilo
+        with LOCK_PEDIDOS:
+            pedido = dict(PEDIDOS[id_orden]) if id_orden in PEDIDOS else None
+        
+        if pedido is None:
             return {
                 "error": True,
                 "mensaje": f"Orden '{id_orden}' no encontrada. Verifica que el ID sea correcto."
             }
         
-        pedido = PEDIDOS[id_orden]
-        
         return {
             "error": False,
             **pedido
@@ -200,6 +232,54 @@ def rastrear_pedido(id_orden: str) -> Dict[str, Any]:
         }
 
 
+# Máximo de pedidos por consulta de rastreo múltiple
+MAX_PEDIDOS_POR_CONSULTA = 20
+
+
+def rastrear_pedidos(ids_orden: List[str]) -> Dict[str, Any]:
+    """Rastrea el estado de varios pedidos en una sola llamada"""
+    try:
+        # Un solo ID como string se trata como lista de un elemento (no se itera por caracteres)
+        if isinstance(ids_orden, str):
+            ids_orden = [ids_orden]
+
+        ids = list(dict.fromkeys(id_orden.upper().strip() for id_orden in ids_orden))
+
+        if not ids:
+            return {
+                "error": True,
+                "mensaje": "Debes indicar al menos un ID de orden."
+            }
+
+        if len(ids) > MAX_PEDIDOS_POR_CONSULTA:
+            return {
+                "error": True,
+                "mensaje": f"Puedes consultar hasta {MAX_PEDIDOS_POR_CONSULTA} pedidos a la vez (recibidos: {len(ids)})."
+            }
+
+        # Copiamos los pedidos bajo el lock: pueden actualizarse desde otro hilo
+        with LOCK_PEDIDOS:
+            pedidos = [dict(PEDIDOS[id_orden]) for id_orden in ids if id_orden in PEDIDOS]
+            no_encontrados = [id_orden for id_orden in ids if id_orden not in PEDIDOS]
+
+        if not pedidos:
+            return {
+                "error": True,
+                "mensaje": f"Ninguna de las órdenes fue encontrada: {', '.join(no_encontrados)}. Verifica que los IDs sean correctos."
+            }
+
+        return {
+            "error": False,
+            "pedidos": pedidos,
+            "no_encontrados": no_encontrados
+        }
+    except Exception as e:
+        return {
+            "error": True,
+            "mensaje": f"Error al rastrear pedidos: {str(e)}"
+        }
+
+
 def explicar_politica_devolucion() -> Dict[str, Any]:
     """Explica la política de devolución"""
     try:
@@ -235,39 +315,58 @@ def consultar_info_plataforma(tipo_info: str) -> Dict[str, Any]:
         }
 
 
-def obtener_historial_compras(email: str) -> Dict[str, Any]:
-    """Obtiene el historial completo de compras de un cliente"""
+def obtener_historial_compras(email: str, estado: Optional[str] = None, solo_resumen: bool = False) -> Dict[str, Any]:
+    """Obtiene el historial de compras de un cliente, o solo su resumen"""
     try:
         email = email.lower().strip()
-        historial = []
 
-        for pedido_id, pedido in PEDIDOS.items():
-            if pedido.get("email", "").lower() == email:
-                pedido_info = {
-                    "id_orden": pedido["id"],
-                    "fecha": pedido["fecha"],
-                    "estado": pedido["estado"],
-                    "productos": pedido["productos"],
-                    "total_productos": len(pedido["productos"])
+        # Copiamos resumen y pedidos bajo el lock: pueden actualizarse desde otro hilo
+        with LOCK_PEDIDOS:
+            if email not in RESUMENES_CLIENTES:
+                return {
+                    "error": True,
+                    "mensaje": f"No se encontraron compras para el email: {email}. Verifica que el email sea correcto o que hayas realizado compras con nosotros."
                 }
 
-                if "direccion" in pedido:
-                    pedido_info["direccion"] = pedido["direccion"]
+            if solo_resumen:
+                resumen = copy.deepcopy(RESUMENES_CLIENTES[email])
+            else:
+                # Usamos el índice por cliente en lugar de recorrer todos los pedidos
+                pedidos = [dict(PEDIDOS[pedido_id]) for pedido_id in PEDIDOS_POR_CLIENTE[email]]
 
-                if "tracking" in pedido:
-                    pedido_info["tracking_info"] = pedido["tracking"]
+        # El resumen solo acompaña a la respuesta resumida: con el historial completo sería redundante
+        if solo_resumen:
+            return {
+                "error": False,
+                "email": email,
+                "resumen": resumen
+            }
 
-                if "fecha_entrega" in pedido:
-                    pedido_info["fecha_entrega"] = pedido["fecha_entrega"]
+        historial = []
 
-                historial.append(pedido_info)
+        for pedido in pedidos:
+            if estado and pedido["estado"].lower() != estado.lower():
+                continue
 
-        if not historial:
-            return {
-                "error": True,
-                "mensaje": f"No se encontraron compras para el email: {email}. Verifica que el email sea correcto o que hayas realizado compras con nosotros."
+            pedido_info = {
+                "id_orden": pedido["id"],
+                "fecha": pedido["fecha"],
+                "estado": pedido["estado"],
+                "productos": pedido["productos"],
+                "total_productos": len(pedido["productos"])
             }
 
+            if "direccion" in pedido:
+                pedido_info["direccion"] = pedido["direccion"]
+
+            if "tracking" in pedido:
+                pedido_info["tracking_info"] = pedido["tracking"]
+
+            if "fecha_entrega" in pedido:
+                pedido_info["fecha_entrega"] = pedido["fecha_entrega"]
+
+            historial.append(pedido_info)
+
         # Ordenamos por fecha (más reciente primero)
         historial.sort(key=lambda x: x["fecha"], reverse=True)
 
@@ -275,8 +374,7 @@ def obtener_historial_compras(email: str) -> Dict[str, Any]:
             "error": False,
             "email": email,
             "total_pedidos": len(historial),
-            "historial": historial,
-            "resumen": f"Se encontraron {len(historial)} pedido(s) para este cliente"
+            "historial": historial
         }
     except Exception as e:
         return {
@@ -291,6 +389,7 @@ TOOL_FUNCTIONS = {
     "listar_productos": listar_productos,
     "consultar_categorias": consultar_categorias,
     "rastrear_pedido": rastrear_pedido,
+    "rastrear_pedidos": rastrear_pedidos,
     "explicar_politica_devolucion": explicar_politica_devolucion,
     "consultar_info_plataforma": consultar_info_plataforma,
     "obtener_historial_compras": obtener_historial_compras
@@ -306,4 +405,55 @@ def ejecutar_herramienta(nombre: str, argumentos: Dict[str, Any]) -> Dict[str, A
         }
     
     func = TOOL_FUNCTIONS[nombre]
-    return func(**argumentos)
\ No newline at end of file
+    return func(**argumentos)
+
+
+# ==================== EJECUCIÓN ASÍNCRONA ====================
+# Las herramientas pueden declararse con "async def": se esperan directamente.
+# Las síncronas se ejecutan en un pool de hilos acotado para no bloquear el event loop.
+
+# Timeout por defecto (segundos) y timeouts específicos por herramienta
+TIMEOUT_DEFECTO = float(os.getenv("TOOL_TIMEOUT", "10"))
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "rastrear_pedido": 5,
+    "rastrear_pedidos": 10,
+    "obtener_historial_compras": 15
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TOOL_MAX_WORKERS", "8")),
+    thread_name_prefix="tool"
+)
+
+
+async def ejecutar_herramienta_async(nombre: str, argumentos: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ejecuta una herramienta sin bloquear el event loop, con timeout por herramienta.
+    Si la tarea que la invoca se cancela, la cancelación se propaga a las herramientas
+    async; las síncronas terminan en su hilo pero su resultado se descarta.
+    """
+    if nombre not in TOOL_FUNCTIONS:
+        return {
+            "error": True,
+            "mensaje": f"Herramienta '{nombre}' no encontrada"
+        }
+
+    func = TOOL_FUNCTIONS[nombre]
+    timeout = TOOL_TIMEOUTS.get(nombre, TIMEOUT_DEFECTO)
+
+    if inspect.iscoroutinefunction(func):
+        pendiente = func(**argumentos)
+    else:
+        # Copiamos el contexto para conservar el span activo dentro del hilo
+        contexto = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        pendiente = loop.run_in_executor(_executor, functools.partial(contexto.run, func, **argumentos))
+
+    try:
+        return await asyncio.wait_for(pendiente, timeout)
+    except asyncio.TimeoutError:
+        return {
+            "error": True,
+            "timeout": True,
+            "mensaje": f"La herramienta '{nombre}' no respondió en {timeout:g} segundos. Intenta nuevamente en unos minutos."
+        }
@@ -0,0 +1,191 @@
+# tracing.py
+"""
+Trazas distribuidas y logs estructurados en JSON (compatibles con OpenTelemetry)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Iterator
+
+# Span activo en el contexto actual (request, tarea asyncio o hilo)
+_span_actual: ContextVar[Optional["Span"]] = ContextVar("span_actual", default=None)
+
+# Configuración (se completa en configurar_tracing)
+_config: Dict[str, Any] = {
+    "exporter": "stdout",   # stdout | file | none
+    "archivo": "traces.jsonl",
+    "sample_rate": 1.0
+}
+
+# Los spans terminados se encolan y un hilo en segundo plano los escribe,
+# para no hacer I/O bloqueante en el event loop
+_cola_export: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+_hilo_export: Optional[threading.Thread] = None
+_lock_hilo = threading.Lock()
+
+
+class Span:
+    """Un span con identificadores en formato W3C Trace Context"""
+
+    def __init__(self, nombre: str, padre: Optional["Span"] = None, atributos: Optional[Dict[str, Any]] = None):
+        self.nombre = nombre
+        self.trace_id = padre.trace_id if padre else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = padre.span_id if padre else None
+        # El muestreo se decide en el span raíz y lo heredan los hijos
+        self.sampled = padre.sampled if padre else random.random() < _config["sample_rate"]
+        self.atributos: Dict[str, Any] = dict(atributos or {})
+        self.inicio_ns = time.time_ns()
+        self.fin_ns: Optional[int] = None
+        self.estado = "UNSET"
+        self.mensaje_estado = ""
+
+    def set_atributo(self, clave: str, valor: Any):
+        """Agrega o reemplaza un atributo del span"""
+        if valor is not None:
+            self.atributos[clave] = valor
+
+    def set_error(self, error: BaseException):
+        """Marca el span como fallido"""
+        self.estado = "ERROR"
+        self.mensaje_estado = str(error)
+        self.atributos["exception.type"] = type(error).__name__
+        self.atributos["exception.message"] = str(error)
+
+    def a_dict(self) -> Dict[str, Any]:
+        """Serializa el span con los nombres de campo de OTLP/JSON"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.nombre,
+            "startTimeUnixNano": self.inicio_ns,
+            "endTimeUnixNano": self.fin_ns,
+            "attributes": self.atributos,
+            "status": {"code": self.estado, "message": self.mensaje_estado}
+        }
+
+
+def _escribir_spans():
+    """Hilo escritor: mantiene abierto el destino y escribe las líneas encoladas"""
+    destino = open(_config["archivo"], "a", encoding="utf-8") if _config["exporter"] == "file" else sys.stdout
+
+    try:
+        while True:
+            linea = _cola_export.get()
+            if linea is None:
+                break
+            destino.write(linea)
+
+            # Se vacía el buffer solo cuando no quedan spans pendientes
+            if _cola_export.empty():
+                destino.flush()
+    finally:
+        destino.flush()
+        if destino is not sys.stdout:
+            destino.close()
+
+
+def _iniciar_hilo_export():
+    """Arranca el hilo escritor la primera vez que se exporta un span"""
+    global _hilo_export
+    with _lock_hilo:
+        if _hilo_export is None:
+            _hilo_export = threading.Thread(target=_escribir_spans, name="trace-export", daemon=True)
+            _hilo_export.start()
+            atexit.register(cerrar_tracing)
+
+
+def cerrar_tracing():
+    """Escribe los spans pendientes y detiene el hilo escritor"""
+    global _hilo_export
+    with _lock_hilo:
+        if _hilo_export is not None:
+            _cola_export.put(None)
+            _hilo_export.join(timeout=5)
+            _hilo_export = None
+
+
+def _exportar(span: Span):
+    """Encola el span terminado para que lo escriba el hilo exportador"""
+    if _config["exporter"] == "none" or not span.sampled:
+        return
+
+    if _hilo_export is None:
+        _iniciar_hilo_export()
+    _cola_export.put(json.dumps(span.a_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+@contextmanager
+def iniciar_span(nombre: str, **atributos: Any) -> Iterator[Span]:
+    """
+    Abre un span hijo del span activo (o un span raíz si no hay ninguno).
+    Se exporta al salir del bloque, registrando la excepción si la hubo.
+    """
+    span = Span(nombre, padre=_span_actual.get(), atributos=atributos)
+    token = _span_actual.set(span)
+    try:
+        yield span
+        if span.estado == "UNSET":
+            span.estado = "OK"
+    except BaseException as e:
+        span.set_error(e)
+        raise
+    finally:
+        span.fin_ns = time.time_ns()
+        _span_actual.reset(token)
+        _exportar(span)
+
+
+def span_actual() -> Optional[Span]:
+    """Retorna el span activo en el contexto actual"""
+    return _span_actual.get()
+
+
+class FormateadorJSON(logging.Formatter):
+    """Formatea cada registro de log como una línea JSON con los IDs de traza"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+
+        span = _span_actual.get()
+        if span:
+            datos["trace_id"] = span.trace_id
+            datos["span_id"] = span.span_id
+
+        if record.exc_info:
+            datos["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configurar_logging(nivel: str = "INFO"):
+    """Configura el logger raíz para emitir logs estructurados en JSON"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(FormateadorJSON())
+
+    raiz = logging.getLogger()
+    raiz.handlers = [handler]
+    raiz.setLevel(nivel)
+
+
+def configurar_tracing():
+    """Lee la configuración de trazas desde variables de entorno"""
+    cerrar_tracing()
+    _config["exporter"] = os.getenv("TRACE_EXPORTER", "stdout").lower()
+    _config["archivo"] = os.getenv("TRACE_FILE", "traces.jsonl")
+    _config["sample_rate"] = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))